@@ -7,10 +7,56 @@
 //! standard epub files, so they should work on any e-reader that
 //! supports epub files as well.
 
-use std::{fs::File, io::Write, process::Command, time::Duration};
+use std::{
+    borrow::Cow,
+    collections::HashMap,
+    fs::File,
+    io::Write,
+    path::PathBuf,
+    process::{Child, Command, Stdio},
+    sync::{
+        atomic::{AtomicBool, AtomicUsize, Ordering},
+        LazyLock, Mutex,
+    },
+    time::{Duration, Instant},
+};
 
 use furigana_gen::FuriganaGenerator;
 
+// All regexes are compiled once up front, since several of them would
+// otherwise be recompiled for every chapter of a possibly
+// hundreds-of-chapters book.
+// The chapter title and text divs are pulled out together, so each
+// chapter page only needs a single scan.
+static RE_CHAPTER_PARTS: LazyLock<regex::Regex> = LazyLock::new(|| {
+    regex::Regex::new(
+        r#"(?ms)<h1 class=\"p-novel__title[^>]*>(?P<title>.*?)</h1>|<div class=\"[^"]*p-novel__text[^>]*>(?P<text>.*?)</div>"#,
+    )
+    .unwrap()
+});
+static RE_MAIN_NEXT: LazyLock<regex::Regex> = LazyLock::new(|| {
+    regex::Regex::new(
+        r#"(?ms)<a href="([^<]*?)" class="c-pager__item c-pager__item--next">次へ</a>"#,
+    )
+    .unwrap()
+});
+static RE_NOVEL_TITLE: LazyLock<regex::Regex> = LazyLock::new(|| {
+    regex::Regex::new(r#"(?ms)<h1 class=\"p-novel__title\">(.*?)</h1>"#).unwrap()
+});
+static RE_NOVEL_AUTHOR: LazyLock<regex::Regex> = LazyLock::new(|| {
+    regex::Regex::new(r#"(?ms)<div class=\"p-novel__author\">.*?作者：(.*?)</div>"#).unwrap()
+});
+static RE_A_TAG: LazyLock<regex::Regex> =
+    LazyLock::new(|| regex::Regex::new(r#"</?a[^>]*>"#).unwrap());
+static RE_VOLUME_TITLE: LazyLock<regex::Regex> = LazyLock::new(|| {
+    regex::Regex::new(r#"(?ms)<div class=\"p-eplist__chapter-title\">(.*?)</div>"#).unwrap()
+});
+static RE_CHAPTER_LINK: LazyLock<regex::Regex> = LazyLock::new(|| {
+    regex::Regex::new(r#"(?ms)<div class=\"p-eplist__sublist\">(.*?)</div>"#).unwrap()
+});
+static RE_CHAPTER_RANGE: LazyLock<regex::Regex> =
+    LazyLock::new(|| regex::Regex::new(r#"^[0-9]+-[0-9]+$"#).unwrap());
+
 #[derive(Debug, Clone)]
 struct Volume {
     title: String,
@@ -149,7 +195,9 @@ fn epub_title_page(title: &str, subtitle: Option<&str>, author: Option<&str>) ->
 }
 
 fn epub_content_page(title: &str, content: &str) -> String {
-    let mut page = String::new();
+    // Reserve enough space for the content plus the surrounding
+    // boilerplate, so the page is built without reallocations.
+    let mut page = String::with_capacity(content.len() + title.len() + 512);
 
     page.push_str(r#"<?xml version="1.0" encoding="UTF-8"?>
 <!DOCTYPE html>
@@ -177,129 +225,193 @@ fn epub_content_page(title: &str, content: &str) -> String {
     page
 }
 
-const EPUB_CSS: &str = r#"@charset "utf-8";
-body {
-    writing-mode: vertical-rl;
-    -webkit-writing-mode: vertical-rl;
-    -moz-writing-mode: vertical-rl;
-    -o-writing-mode: vertical-rl;
-    -ms-writing-mode: vertical-rl;
-    -epub-writing-mode: vertical-rl;
-
-    text-orientation: upright;
-    -webkit-text-orientation: upright;
-    -moz-text-orientation: upright;
-    -o-text-orientation: upright;
-    -ms-text-orientation: upright;
-    -epub-text-orientation: upright;
-
-    font-size: medium;
-    font-family: serif;
-    text-align: justify;
-    margin: 4% 4%;
-    line-height: 1.75
-}
+/// Stylesheet embedded into the generated epubs, kept in its own file
+/// so it can be edited as plain css.
+const EPUB_CSS: &str = include_str!("epub.css");
+
+/// Number of threads used to download chapters.  The requests
+/// themselves are still spaced out by the rate limiter in `get_page`,
+/// this just lets the network latency of multiple requests overlap.
+const DOWNLOAD_THREADS: usize = 4;
+
+/// Minimum time between the starts of consecutive requests, shared
+/// across all download threads.
+///
+/// IP will be banned for a short time if pages are loaded too fast.
+/// The original script had a wait time of 0.1 seconds, which worked
+/// fine.  0.5 is extra conservative, just to be safe.
+const REQUEST_GAP: Duration = Duration::from_millis(500);
+
+static LAST_REQUEST_TIME: Mutex<Option<Instant>> = Mutex::new(None);
+
+/// Shared http agent, so that connections are kept alive and reused
+/// across requests instead of paying a fresh TCP + TLS handshake for
+/// every page.
+static AGENT: LazyLock<ureq::Agent> = LazyLock::new(|| {
+    const TIMEOUT_SECS: u64 = 60;
 
-div, span, p, img, nav, section, h1, h2, h3, h4, h5, h6 {
-    padding: 0;
-    border: 0;
-    outline: 0;
-    vertical-align: baseline;
-}
-div, span, p, img, nav, section { margin: 0; font-weight: normal; }
-
-h1, h2, h3, h4, h5, h6 { font-weight: bold; }
-h1 { font-size: 1.5em; margin-left: 1.5em; }
-h2 { font-size: 1.3em; margin-left: 1.3em; }
-h3 { font-size: 1.2em; margin-left: 1.2em; }
-h4 { font-size: 1.1em; margin-left: 1.1em; }
-h5 { font-size: 1.0em; margin-left: 1.0em; }
-h6 { font-size: 1.0em; margin-left: 1.0em; }
-
-p {}
-p.blank {
-    width: 1.0em;
-    height: 1.0em;
-}
-strong { font-weight: bold; }
-em { font-style: italic;}
-code{ white-space: pre-wrap; font-family: monospace; }
-q { quotes: "“" "”" "‘" "’"; }
-
-/* For title/cover page. */
-section.titlepage {
-    margin: 1.5em;
-}
+    ureq::AgentBuilder::new()
+        .timeout(Duration::from_secs(TIMEOUT_SECS))
+        // We fake being a browser, because syosetu.com returns 403 otherwise.
+        .user_agent("Mozilla/5.0 (Macintosh; Intel Mac OS X 10_10_1) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/39.0.2171.95 Safari/537.36")
+        .build()
+});
+
+/// How long cached pages stay valid.  Re-runs on the same book within
+/// this window (e.g. to tweak the title or regenerate with furigana)
+/// skip the network and the rate-limit delay entirely.
+const CACHE_TTL: Duration = Duration::from_secs(60 * 60 * 24);
+
+/// Whether get_page may serve pages from the on-disk cache.  Cleared
+/// by the --no-cache flag.  Freshly fetched pages are written to the
+/// cache either way.
+static CACHE_ENABLED: AtomicBool = AtomicBool::new(true);
+
+/// The on-disk cache location for the page at `url`, or `None` if
+/// there's no usable cache directory.
+fn page_cache_path(url: &str) -> Option<PathBuf> {
+    let cache_root = if let Some(dir) = std::env::var_os("XDG_CACHE_HOME") {
+        PathBuf::from(dir)
+    } else if let Some(home) = std::env::var_os("HOME") {
+        PathBuf::from(home).join(".cache")
+    } else {
+        return None;
+    };
 
-nav#toc ol,
-nav#landmarks ol { padding: 0; margin-left: 1em; }
-nav#toc ol li,
-nav#landmarks ol li { list-style-type: none; margin: 0; padding: 0; }
-a.footnote-ref { vertical-align: super; }
-span.smallcaps{ font-variant: small-caps; }
-span.underline{ text-decoration: underline; }
-div.column{ display: inline-block; vertical-align: top; width: 50%; }
-
-/* Misc classes for special styling. */
-.horiz {
-    writing-mode: horizontal-tb;
-    -webkit-writing-mode: horizontal-lr;
-    -moz-writing-mode: horizontal-lr;
-    -o-writing-mode: horizontal-lr;
-    -ms-writing-mode: horizontal-lr;
-    -epub-writing-mode: horizontal-lr;
-}
+    // FNV-1a hash of the url, as a filename that's stable across runs.
+    let mut hash: u64 = 0xcbf29ce484222325;
+    for &byte in url.as_bytes() {
+        hash = (hash ^ byte as u64).wrapping_mul(0x100000001b3);
+    }
 
-.inset {
-    margin-top: 3.0em;
-    margin-bottom: 3.0em;
+    Some(
+        cache_root
+            .join("syosetu2ebook")
+            .join(format!("{:016x}.html", hash)),
+    )
 }
 
-.box {
-    margin: 1.0em;
-    padding 1.0em;
-    border: 1px solid #000;
+/// The cached page at `path`, if it exists and hasn't expired.
+fn read_cached_page(path: &PathBuf) -> Option<String> {
+    let age = std::fs::metadata(path)
+        .ok()?
+        .modified()
+        .ok()?
+        .elapsed()
+        .ok()?;
+    if age > CACHE_TTL {
+        return None;
+    }
+    std::fs::read_to_string(path).ok()
 }
 
-rt {
-    font-size: 0.5em;
-}
+fn get_page(url: &str) -> Result<String, ureq::Error> {
+    // Check the on-disk cache first, so re-runs on the same book don't
+    // hammer the server.
+    let cache_file = page_cache_path(url);
+    if CACHE_ENABLED.load(Ordering::Relaxed) {
+        if let Some(ref path) = cache_file {
+            if let Some(page) = read_cached_page(path) {
+                return Ok(page);
+            }
+        }
+    }
 
-span.pitch_accent {
-    display: inline-block;
-    padding-right: 0.15em;
-    border-right: solid 0.12rem #c0c0c0;
-    border-bottom-right-radius: 0.5em;
-}
-rt span.pitch_accent {
-    padding-right: 0.1em;
-}
+    // Enforce the global inter-request gap.  The lock is held while
+    // sleeping on purpose: that's what spaces out requests from other
+    // threads.
+    {
+        let mut last = LAST_REQUEST_TIME.lock().unwrap();
+        if let Some(last_time) = *last {
+            let elapsed = last_time.elapsed();
+            if elapsed < REQUEST_GAP {
+                std::thread::sleep(REQUEST_GAP - elapsed);
+            }
+        }
+        *last = Some(Instant::now());
+    }
 
-span.pitch_flat {
-    display: inline-block;
-    padding-right: 0.15em;
-    border-right: solid 0.075rem #c0c0c0;
+    let page = AGENT.get(url).call()?.into_string().unwrap();
+
+    // Failing to write the cache is fine, it just means a slower
+    // re-run later.  The entry is written to a temporary name and
+    // renamed into place, so an interrupted write can't leave a
+    // truncated page that would be served as valid later.
+    if let Some(ref path) = cache_file {
+        if let Some(dir) = path.parent() {
+            let tmp_path = path.with_extension("html.tmp");
+            if std::fs::create_dir_all(dir).is_ok() && std::fs::write(&tmp_path, &page).is_ok() {
+                let _ = std::fs::rename(&tmp_path, path);
+            }
+        }
+    }
+
+    Ok(page)
 }
-rt span.pitch_flat {
-    padding-right: 0.1em;
+
+/// Iterates over the inner html of each `<p>` element in `html`, in
+/// order.
+///
+/// This is a single linear scan over the html, and is what the hot
+/// paragraph loop uses instead of a regex.  Nested `<p>` tags aren't
+/// handled, but they're invalid html anyway and syosetu.com doesn't
+/// produce them.
+fn paragraphs(html: &str) -> impl Iterator<Item = &str> {
+    let mut rest = html;
+
+    std::iter::from_fn(move || loop {
+        let tag_start = rest.find("<p")?;
+        let after_tag = &rest[(tag_start + 2)..];
+
+        // Make sure it's actually a <p> tag, and not e.g. <pre>.
+        match after_tag.as_bytes().first() {
+            Some(b'>') | Some(b' ') | Some(b'\t') | Some(b'\r') | Some(b'\n') => {}
+            _ => {
+                rest = after_tag;
+                continue;
+            }
+        }
+
+        let Some(tag_end) = after_tag.find('>') else {
+            rest = "";
+            return None;
+        };
+        let content_and_beyond = &after_tag[(tag_end + 1)..];
+
+        let Some(content_end) = content_and_beyond.find("</p>") else {
+            rest = "";
+            return None;
+        };
+
+        rest = &content_and_beyond[(content_end + "</p>".len())..];
+        return Some(&content_and_beyond[..content_end]);
+    })
 }
-"#;
 
-fn get_page(url: &str) -> Result<String, ureq::Error> {
-    const TIMEOUT_SECS: u64 = 60;
+/// Extracts the chapter url number from a chapter link in
+/// `<a href="/book_id/number/">title</a>` format: the digits right
+/// after the second slash.  Returns "" if the link isn't in that form.
+///
+/// This used to be a regex, but it's just three substring searches, and
+/// it runs once per chapter.
+fn chapter_link_number(link: &str) -> &str {
+    let Some(href_start) = link.find("href=\"/") else {
+        return "";
+    };
+    let book_id_and_beyond = &link[(href_start + "href=\"/".len())..];
 
-    // IP will be banned for a short time if pages are loaded too fast.
-    // The original script had a wait time of 0.1 seconds, which worked
-    // fine.  1.0 is extra conservative, just to be safe.
-    std::thread::sleep(Duration::from_secs_f32(0.5));
+    let Some(slash) = book_id_and_beyond.find('/') else {
+        return "";
+    };
+    let number_and_beyond = &book_id_and_beyond[(slash + 1)..];
 
-    let agent: ureq::Agent = ureq::AgentBuilder::new()
-      .timeout(Duration::from_secs(TIMEOUT_SECS))
-      // We fake being a browser, because syosetu.com returns 403 otherwise.
-      .user_agent("Mozilla/5.0 (Macintosh; Intel Mac OS X 10_10_1) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/39.0.2171.95 Safari/537.36")
-      .build();
+    let number_end = number_and_beyond
+        .as_bytes()
+        .iter()
+        .position(|b| !b.is_ascii_digit())
+        .unwrap_or(number_and_beyond.len());
 
-    Ok(agent.get(url).call()?.into_string().unwrap())
+    &number_and_beyond[..number_end]
 }
 
 fn maybe_group<'a>(hit: Option<regex::Captures<'a>>, group_index: usize) -> &'a str {
@@ -310,28 +422,43 @@ fn maybe_group<'a>(hit: Option<regex::Captures<'a>>, group_index: usize) -> &'a
     }
 }
 
-/// Common substitutions.
-fn common_subs(text: &str) -> String {
-    const SUBS: &[[&str; 2]] = &[
-        ["0", "０"],
-        ["1", "１"],
-        ["2", "２"],
-        ["3", "３"],
-        ["4", "４"],
-        ["5", "５"],
-        ["6", "６"],
-        ["7", "７"],
-        ["8", "８"],
-        ["9", "９"],
-        ["&quot;", "\""],
-    ];
-
-    let mut new_text: String = text.into();
-    for sub in SUBS {
-        new_text = new_text.replace(sub[0], sub[1]);
+/// Common substitutions: ascii digits to their full-width equivalents,
+/// and `&quot;` to a plain double quote.
+///
+/// This is done in a single pass over the text, rather than one full
+/// scan (and reallocation) per substitution.  Text that needs no
+/// substitutions is returned borrowed, without allocating at all.
+fn common_subs(text: &str) -> Cow<'_, str> {
+    if text
+        .find(|c: char| c.is_ascii_digit() || c == '&')
+        .is_none()
+    {
+        return Cow::Borrowed(text);
     }
 
-    new_text
+    let mut new_text = String::with_capacity(text.len());
+
+    let mut rest = text;
+    while let Some(i) = rest.find(|c: char| c.is_ascii_digit() || c == '&') {
+        new_text.push_str(&rest[..i]);
+        if rest.as_bytes()[i] == b'&' {
+            if rest[i..].starts_with("&quot;") {
+                new_text.push('"');
+                rest = &rest[i + "&quot;".len()..];
+            } else {
+                new_text.push('&');
+                rest = &rest[i + 1..];
+            }
+        } else {
+            // '0' through '9' map to '０' through '９'.
+            new_text
+                .push(char::from_u32(rest.as_bytes()[i] as u32 - '0' as u32 + '０' as u32).unwrap());
+            rest = &rest[i + 1..];
+        }
+    }
+    new_text.push_str(rest);
+
+    Cow::Owned(new_text)
 }
 
 fn ascii_to_fullwidth(text: &str) -> String {
@@ -361,53 +488,54 @@ fn generate_chapter(
     title_tag: &str,
     mut furgen_session: Option<&mut furigana_gen::Session>,
 ) -> Chapter {
-    let mut text = String::new();
-
-    let mut process = |text: &str| -> String {
+    // The generated xhtml is usually a bit smaller than the input html,
+    // so this should avoid reallocations during assembly.
+    let mut text = String::with_capacity(chapter_html_in.len());
+
+    // Appends `text` to `out` with the common substitutions (and
+    // optionally furigana) applied.  Appending directly means
+    // unmodified text is copied over without any intermediate
+    // allocations.
+    let mut process_into = |out: &mut String, text: &str| {
         let text = common_subs(text);
 
         // Optionally add furigana.
         if let Some(ref mut session) = furgen_session {
-            session.add_html_furigana(&text)
+            out.push_str(&session.add_html_furigana(&text));
         } else {
-            text
+            out.push_str(&text);
         }
     };
 
-    let re_title = regex::Regex::new(r#"(?ms)<h1 class=\"p-novel__title[^>]*>(.*?)</h1>"#).unwrap();
-    let chapter_title = maybe_group(re_title.captures(chapter_html_in), 1)
-        .trim()
-        .to_string();
-
-    text.push_str(&format!(
-        "<{}>{}</{}>\n\n",
-        title_tag,
-        process(&chapter_title),
-        title_tag
-    ));
-
-    let re_text =
-        regex::Regex::new(r#"(?ms)<div class=\"[^"]*p-novel__text[^>]*>(.*?)</div>"#).unwrap();
-    let re_paragraph = regex::Regex::new(r#"(?ms)<p[^>]*>(.*?)</p>"#).unwrap();
+    // Pull out the title and the text divs in a single pass over the
+    // chapter html.
+    let mut chapter_title = "";
+    let mut chapter_texts: Vec<&str> = Vec::new();
+    for hit in RE_CHAPTER_PARTS.captures_iter(chapter_html_in) {
+        if let Some(title) = hit.name("title") {
+            if chapter_title.is_empty() {
+                chapter_title = title.as_str().trim();
+            }
+        } else if let Some(chapter_text) = hit.name("text") {
+            chapter_texts.push(chapter_text.as_str().trim());
+        }
+    }
+    let chapter_title = chapter_title.to_string();
 
-    let chapter_texts: Vec<_> = re_text
-        .captures_iter(chapter_html_in)
-        .map(|c| maybe_group(Some(c), 1).trim())
-        .collect();
+    text.push_str(&format!("<{}>", title_tag));
+    process_into(&mut text, &chapter_title);
+    text.push_str(&format!("</{}>\n\n", title_tag));
 
     for (i, chapter_text) in chapter_texts.iter().enumerate() {
-        for paragraph in re_paragraph
-            .captures_iter(chapter_text)
-            .map(|c| c.get(1).map(|m| m.as_str()).unwrap_or("").trim())
-        {
-            if paragraph == "<br>" || paragraph == "<br/>" || paragraph == "<br />" {
+        for paragraph in paragraphs(chapter_text).map(|p| p.trim()) {
+            if matches!(paragraph, "<br>" | "<br/>" | "<br />") {
                 // We do this because authors on syosetu.com really love
                 // to overuse <br/> tags.  Combined with the styling of
                 // p.blank, this keeps the spacing not completely crazy.
                 text.push_str("<p class=\"blank\"></p>\n");
             } else if paragraph != "" {
                 text.push_str("<p>");
-                text.push_str(&process(paragraph));
+                process_into(&mut text, paragraph);
                 text.push_str("</p>\n");
             }
         }
@@ -432,6 +560,7 @@ struct Args {
     furigana_exclude: Option<usize>,
     furigana_learn_mode: bool,
     furigana_word_stats: bool,
+    no_cache: bool,
     volume: Option<usize>,
     chapters: Option<String>,
     title: Option<String>,
@@ -463,6 +592,9 @@ impl Args {
         let furigana_word_stats = long("furigana-word-stats")
             .help("When auto-generating furigana is enabled, this will output a word stats file showing all the words parsed along with some statistics about them.")
             .switch();
+        let no_cache = long("no-cache")
+            .help("Re-download all pages, ignoring the local page cache. Useful when a book has updated within the last day.")
+            .switch();
         let volume = short('v')
             .long("volume")
             .help("For books with multiple volumes, only download the Nth volume.")
@@ -487,6 +619,7 @@ impl Args {
             furigana_exclude,
             furigana_learn_mode,
             furigana_word_stats,
+            no_cache,
             volume,
             chapters,
             title,
@@ -501,8 +634,7 @@ impl Args {
     /// Prints its own error messages if there's a problem.
     fn validate(&self) -> bool {
         if let Some(ref chapters) = self.chapters {
-            let validate = regex::Regex::new(r#"^[0-9]+-[0-9]+$"#).unwrap();
-            if !validate.is_match(chapters) {
+            if !RE_CHAPTER_RANGE.is_match(chapters) {
                 println!("Error: invalid chaper range: must be in N-M format, for example 3-10.");
                 return false;
             }
@@ -530,6 +662,10 @@ fn main() {
         return;
     }
 
+    if args.no_cache {
+        CACHE_ENABLED.store(false, Ordering::Relaxed);
+    }
+
     let furigana_generator = FuriganaGenerator::new(
         args.furigana_exclude.unwrap_or(0),
         true,
@@ -547,11 +683,6 @@ fn main() {
     // Download main page (possibly paginated across multiple actual pages).
     println!("Downloading table of contents...");
     let main_page = {
-        let re_main_next = regex::Regex::new(
-            r#"(?ms)<a href="([^<]*?)" class="c-pager__item c-pager__item--next">次へ</a>"#,
-        )
-        .unwrap();
-
         let mut content = String::new();
         let mut next_url: Option<String> = Some(main_url.into());
         let mut page_num = 1;
@@ -560,7 +691,7 @@ fn main() {
             let page = get_page(&url).unwrap();
             content.push_str(&page);
 
-            let link = maybe_group(re_main_next.captures(&page), 1);
+            let link = maybe_group(RE_MAIN_NEXT.captures(&page), 1);
             next_url = if !link.is_empty() {
                 Some(format!("{}{}", base_url, link))
             } else {
@@ -576,53 +707,43 @@ fn main() {
     let title = if let Some(title) = args.title {
         title
     } else {
-        let re = regex::Regex::new(r#"(?ms)<h1 class=\"p-novel__title\">(.*?)</h1>"#).unwrap();
-        common_subs(maybe_group(re.captures(&main_page), 1).trim())
+        common_subs(maybe_group(RE_NOVEL_TITLE.captures(&main_page), 1).trim()).into_owned()
     };
 
     let author = {
-        let re1 = regex::Regex::new(r#"(?ms)<div class=\"p-novel__author\">.*?作者：(.*?)</div>"#)
-            .unwrap();
-        let re2 = regex::Regex::new(r#"<a[^>]*>"#).unwrap();
-
-        let mut author: String = maybe_group(re1.captures(&main_page), 1).trim().into();
-        author = re2.replace_all(&author, "").trim().into();
-        author = author.replace("</a>", "").trim().into();
-        author
+        // Strip both opening and closing <a> tags in one pass.
+        let author = maybe_group(RE_NOVEL_AUTHOR.captures(&main_page), 1);
+        RE_A_TAG.replace_all(author, "").trim().to_string()
     };
 
-    // A vector of (volume_title, chapter_links), where the chapter links are
-    // in `<a href="url">title</a>` format.
+    // A vector of (volume_title, chapter_url_numbers), where a chapter
+    // url number is the chapter's path segment on syosetu.com.  The
+    // numbers are pulled out of the chapter links here, in the same
+    // pass that finds the links, so the download loop doesn't have to
+    // do any link parsing at all.
     let table_of_contents: Vec<(&str, Vec<&str>)> = {
-        let re_volumes =
-            regex::Regex::new(r#"(?ms)<div class=\"p-eplist__chapter-title\">(.*?)</div>"#)
-                .unwrap();
-
-        fn get_chapter_links<'a>(html: &'a str) -> Vec<&'a str> {
-            let re_chapters =
-                regex::Regex::new(r#"(?ms)<div class=\"p-eplist__sublist\">(.*?)</div>"#).unwrap();
-
-            re_chapters
+        fn get_chapter_numbers<'a>(html: &'a str) -> Vec<&'a str> {
+            RE_CHAPTER_LINK
                 .captures_iter(html)
-                .map(|c| c.get(1).map(|m| m.as_str()).unwrap_or("").trim())
+                .map(|c| chapter_link_number(c.get(1).map(|m| m.as_str()).unwrap_or("")))
                 .collect()
         }
 
-        let volume_titles: Vec<&str> = re_volumes
+        let volume_titles: Vec<&str> = RE_VOLUME_TITLE
             .captures_iter(&main_page)
             .map(|c| c.get(1).map(|m| m.as_str()).unwrap_or("").trim())
             .collect();
 
         let table_of_contents: Vec<_> = if volume_titles.len() > 1 {
-            let volume_htmls: Vec<&str> = re_volumes.split(&main_page).skip(1).collect();
+            let volume_htmls: Vec<&str> = RE_VOLUME_TITLE.split(&main_page).skip(1).collect();
 
             volume_titles
                 .iter()
                 .zip(volume_htmls.iter())
-                .map(|(&title, html)| (title, get_chapter_links(html)))
+                .map(|(&title, html)| (title, get_chapter_numbers(html)))
                 .collect()
         } else {
-            vec![("", get_chapter_links(&main_page))]
+            vec![("", get_chapter_numbers(&main_page))]
         };
 
         table_of_contents
@@ -632,10 +753,12 @@ fn main() {
     println!("Author: {}", author);
     println!("Volumes: {}", table_of_contents.len());
 
+    // Kepubify runs concurrently with the remaining downloads; these
+    // are the in-flight conversions, waited on at the end.
+    let mut kepubify_procs: Vec<(String, Child)> = Vec::new();
+
     // Download chapter pages and generate books.
     {
-        let re_chapter_number = regex::Regex::new(r#"(?ms)href=\"/[^/]*/([0-9]+)"#).unwrap();
-
         // Possibly limit to just the single specified volume.
         let vol_range = if let Some(vol) = args.volume {
             if vol < 1 || vol > table_of_contents.len() {
@@ -675,31 +798,77 @@ fn main() {
                     0..table_of_contents[vol_i].1.len()
                 };
 
-                for chap_i in chapter_range {
-                    let chapter_link = &table_of_contents[vol_i].1[chap_i];
-                    println!(
-                        "    Downloading chapter {}/{}",
-                        chap_i + 1,
-                        table_of_contents[vol_i].1.len(),
-                    );
-
-                    let sub_chapter_url_number =
-                        maybe_group(re_chapter_number.captures(chapter_link), 1);
-                    let sub_chapter_url = format!("{}/{}", main_url, sub_chapter_url_number);
-                    let chapter_html = get_page(&sub_chapter_url).unwrap();
-
-                    chapters.push(generate_chapter(
-                        &chapter_html,
-                        "h1",
-                        furigen_session.as_mut(),
-                    ));
+                // Download the chapter html pages, spread across a
+                // small pool of threads so that network latency
+                // overlaps between requests.  The main thread parses
+                // chapters in order as they come in, so each page's
+                // html is dropped right after parsing instead of the
+                // whole book's html piling up in memory.  (Parsing has
+                // to be sequential regardless, because furigana
+                // generation is stateful across chapters.)
+                {
+                    let chapter_indices: Vec<usize> = chapter_range.collect();
+                    let next_job = AtomicUsize::new(0);
+                    let (tx, rx) = std::sync::mpsc::channel::<(usize, String)>();
+
+                    std::thread::scope(|scope| {
+                        for _ in 0..DOWNLOAD_THREADS.min(chapter_indices.len()) {
+                            let tx = tx.clone();
+                            let chapter_indices = &chapter_indices;
+                            let next_job = &next_job;
+                            let table_of_contents = &table_of_contents;
+                            scope.spawn(move || loop {
+                                let job_i = next_job.fetch_add(1, Ordering::Relaxed);
+                                if job_i >= chapter_indices.len() {
+                                    break;
+                                }
+                                let chap_i = chapter_indices[job_i];
+                                println!(
+                                    "    Downloading chapter {}/{}",
+                                    chap_i + 1,
+                                    table_of_contents[vol_i].1.len(),
+                                );
+
+                                let sub_chapter_url =
+                                    format!("{}/{}", main_url, table_of_contents[vol_i].1[chap_i]);
+                                let chapter_html = get_page(&sub_chapter_url).unwrap();
+
+                                tx.send((job_i, chapter_html)).unwrap();
+                            });
+                        }
+                        drop(tx);
+
+                        // Pages can arrive out of order, so hold any
+                        // early arrivals until their turn comes up.
+                        let mut early: HashMap<usize, String> = HashMap::new();
+                        let mut next_to_parse = 0;
+                        while next_to_parse < chapter_indices.len() {
+                            let chapter_html = if let Some(html) = early.remove(&next_to_parse) {
+                                html
+                            } else {
+                                let (job_i, html) = rx.recv().unwrap();
+                                if job_i != next_to_parse {
+                                    early.insert(job_i, html);
+                                    continue;
+                                }
+                                html
+                            };
+
+                            chapters.push(generate_chapter(
+                                &chapter_html,
+                                "h1",
+                                furigen_session.as_mut(),
+                            ));
+                            next_to_parse += 1;
+                        }
+                    });
                 }
 
                 Volume {
                     title: title.clone(),
                     subtitle: table_of_contents[vol_i].0.into(),
                     author: author.clone(),
-                    chapters: chapters.clone(),
+                    chapters,
                     chapter_range: args.chapters.as_ref().map(|r| parse_number_range(r)),
                 }
             };
@@ -730,37 +899,49 @@ fn main() {
                         .into()
                 };
 
-                // Make epub.
+                // Make epub.  It's written to a temporary name and
+                // then renamed into place, so an interrupted run can't
+                // leave a truncated epub behind under the final name.
                 let epub_filepath = format!("{}.epub", book_filename);
                 {
                     println!("    Writing \"{}\"", epub_filepath);
-                    let mut f = File::create(&epub_filepath).unwrap();
-                    f.write_all(&epub_bytes).unwrap();
+                    let tmp_filepath = format!("{}.tmp", epub_filepath);
+                    std::fs::write(&tmp_filepath, &epub_bytes).unwrap();
+                    std::fs::rename(&tmp_filepath, &epub_filepath).unwrap();
                 }
 
-                // Optionally make kepub.
+                // Optionally make kepub.  This is spawned rather than
+                // waited on here, so the conversion overlaps with
+                // downloading the next volume.
                 let kepub_filepath = format!("{}.kepub.epub", book_filename);
                 if args.kepub {
                     println!("    Generating \"{}\"", kepub_filepath);
-                    let output = Command::new("kepubify")
+                    let proc = Command::new("kepubify")
                         .arg(&epub_filepath)
                         .arg("-o")
                         .arg(&kepub_filepath)
-                        .output()
+                        .stdout(Stdio::piped())
+                        .stderr(Stdio::piped())
+                        .spawn()
                         .expect(
                             "Failed to execute kepubify: are you sure it's installed and in your path?",
                         );
-
-                    std::io::stdout().write_all(&output.stdout).unwrap();
-                    if !output.status.success() {
-                        std::io::stderr().write_all(&output.stderr).unwrap();
-                        panic!("kepubify did not succeed.");
-                    }
+                    kepubify_procs.push((kepub_filepath, proc));
                 }
             }
         }
     }
 
+    // Wait for any in-flight kepubify conversions to finish.
+    for (kepub_filepath, proc) in kepubify_procs {
+        let output = proc.wait_with_output().unwrap();
+        std::io::stdout().write_all(&output.stdout).unwrap();
+        if !output.status.success() {
+            std::io::stderr().write_all(&output.stderr).unwrap();
+            panic!("kepubify did not succeed on \"{}\".", kepub_filepath);
+        }
+    }
+
     // Save word stats to a text file.
     if args.furigana_word_stats {
         if let Some(session) = furigen_session {